@@ -1,16 +1,61 @@
 import pandas as pd
-from collections import defaultdict
+import numpy as np
+from scipy.sparse import csr_matrix
 import sys
 
-def calculate_player_minutes(lineup_stints_file, players_file, output_file):
+def build_lineup_incidence(lineup_stints_df):
+    """
+    Builds a sparse stint x player incidence matrix from the lineup strings.
+
+    Every player on court in a stint, home or away, is marked with 1.
+
+    Args:
+        lineup_stints_df (pd.DataFrame): Lineup stints with HOME_LINEUP and AWAY_LINEUP columns.
+
+    Returns:
+        tuple: (scipy.sparse.csr_matrix of shape (n_stints, n_players), np.ndarray of PLAYER_IDs
+        giving the player of each column, in ascending order).
+    """
+    lineups = lineup_stints_df[['HOME_LINEUP', 'AWAY_LINEUP']].reset_index(drop=True)
+
+    entries = []
+    for column in ['HOME_LINEUP', 'AWAY_LINEUP']:
+        players = lineups[column].dropna().str.split(', ').explode()
+        players = players[players.notna() & (players != '')]
+        entries.append(pd.DataFrame({
+            'ROW': players.index.to_numpy(),
+            'PLAYER_ID': players.astype('int64').to_numpy()
+        }))
+    entries = pd.concat(entries, ignore_index=True)
+
+    player_ids, cols = np.unique(entries['PLAYER_ID'].to_numpy(), return_inverse=True)
+    incidence = csr_matrix(
+        (np.ones(len(entries), dtype=np.int8), (entries['ROW'].to_numpy(), cols)),
+        shape=(len(lineups), len(player_ids))
+    )
+    return incidence, player_ids
+
+def _group_indicator(keys):
+    """Returns a sparse row x group indicator matrix and the sorted unique group keys."""
+    groups, group_idx = np.unique(np.asarray(keys), return_inverse=True)
+    indicator = csr_matrix(
+        (np.ones(len(group_idx)), (np.arange(len(group_idx)), group_idx)),
+        shape=(len(group_idx), len(groups))
+    )
+    return indicator, groups
+
+def calculate_player_minutes(lineup_stints_file, players_file, output_file, game_output_file=None, period_output_file=None):
     """
     Calculates the total minutes played by each player based on stint data
-    and saves the result to a CSV file.
+    and saves the result to a CSV file. Optionally also saves per-game and
+    per-period minute breakdowns.
 
     Args:
         lineup_stints_file (str): Path to the lineup_stints.csv file.
         players_file (str): Path to the players.csv file for name mapping.
         output_file (str): Path for the output CSV file.
+        game_output_file (str, optional): Path for the player x game minutes CSV file.
+        period_output_file (str, optional): Path for the player x period minutes CSV file.
     """
     try:
         # 1. Load the required data
@@ -21,28 +66,14 @@ def calculate_player_minutes(lineup_stints_file, players_file, output_file):
 
         # 2. Calculate total seconds played for each player
         print("Calculating total playing time for each player...")
-        player_seconds = defaultdict(float)
-
-        for _, row in lineup_stints_df.iterrows():
-            duration = row['DURATION_SECONDS']
-            
-            # Combine home and away players into a single list
-            home_players = row['HOME_LINEUP']
-            away_players = row['AWAY_LINEUP']
-            
-            all_players_str = []
-            if pd.notna(home_players) and home_players:
-                all_players_str.extend(home_players.split(', '))
-            if pd.notna(away_players) and away_players:
-                all_players_str.extend(away_players.split(', '))
-            
-            # Add duration to each player's total
-            for player_id_str in all_players_str:
-                player_id = int(player_id_str)
-                player_seconds[player_id] += duration
-
-        # 3. Convert dictionary to a DataFrame
-        minutes_df = pd.DataFrame(player_seconds.items(), columns=['PLAYER_ID', 'TOTAL_SECONDS'])
+        incidence, player_ids = build_lineup_incidence(lineup_stints_df)
+        durations = lineup_stints_df['DURATION_SECONDS'].to_numpy(dtype=float)
+        # Weight every stint row by its duration once, then reuse for all breakdowns
+        weighted = incidence.T.multiply(durations).tocsr()
+        player_seconds = np.asarray(weighted.sum(axis=1)).ravel()
+
+        # 3. Convert totals to a DataFrame
+        minutes_df = pd.DataFrame({'PLAYER_ID': player_ids, 'TOTAL_SECONDS': player_seconds})
         minutes_df['TOTAL_MINUTES'] = minutes_df['TOTAL_SECONDS'] / 60
 
         # 4. Merge with player names
@@ -68,6 +99,43 @@ def calculate_player_minutes(lineup_stints_file, players_file, output_file):
         output_df.to_csv(output_file, index=False)
         print(f"Successfully saved to {output_file}.")
 
+        # 8. Per-game minutes: (players x stints) @ (stints x games)
+        if game_output_file:
+            print("Calculating minutes per player and game...")
+            game_indicator, game_ids = _group_indicator(lineup_stints_df['GAME_ID'].astype('int64'))
+            game_seconds = (weighted @ game_indicator).tocoo()
+
+            game_df = pd.DataFrame({
+                'PLAYER_ID': player_ids[game_seconds.row],
+                'GAME_ID': game_ids[game_seconds.col],
+                'MINUTES': (game_seconds.data / 60).round(2)
+            })
+            game_df = pd.merge(game_df, players_df, on='PLAYER_ID')
+            game_df = game_df[['GAME_ID', 'PLAYER_ID', 'PLAYER_NAME', 'MINUTES']]
+            game_df.sort_values(by=['GAME_ID', 'MINUTES'], ascending=[True, False], inplace=True)
+
+            print(f"Saving player game minutes to {game_output_file}...")
+            game_df.to_csv(game_output_file, index=False)
+            print(f"Successfully saved to {game_output_file}.")
+
+        # 9. Per-period minutes: (players x stints) @ (stints x periods)
+        if period_output_file:
+            print("Calculating minutes per player and period...")
+            period_indicator, periods = _group_indicator(lineup_stints_df['PERIOD'].astype('int64'))
+            period_seconds = (weighted @ period_indicator).toarray()
+
+            period_df = pd.DataFrame(
+                (period_seconds / 60).round(2),
+                columns=[f'PERIOD_{period}_MINUTES' for period in periods]
+            )
+            period_df.insert(0, 'PLAYER_ID', player_ids)
+            period_df = pd.merge(players_df, period_df, on='PLAYER_ID')
+            period_df = period_df.set_index('PLAYER_ID').loc[output_df['PLAYER_ID']].reset_index()
+
+            print(f"Saving player period minutes to {period_output_file}...")
+            period_df.to_csv(period_output_file, index=False)
+            print(f"Successfully saved to {period_output_file}.")
+
     except FileNotFoundError as e:
         print(f"Error: The file {e.filename} was not found.", file=sys.stderr)
     except Exception as e:
@@ -77,4 +145,6 @@ if __name__ == '__main__':
     LINEUP_STINTS_CSV = 'lineup_stints.csv'
     PLAYERS_CSV = 'players.csv'
     OUTPUT_CSV = 'player_minutes.csv'
-    calculate_player_minutes(LINEUP_STINTS_CSV, PLAYERS_CSV, OUTPUT_CSV) 
\ No newline at end of file
+    GAME_OUTPUT_CSV = 'player_game_minutes.csv'
+    PERIOD_OUTPUT_CSV = 'player_period_minutes.csv'
+    calculate_player_minutes(LINEUP_STINTS_CSV, PLAYERS_CSV, OUTPUT_CSV, GAME_OUTPUT_CSV, PERIOD_OUTPUT_CSV)
@@ -0,0 +1,190 @@
+import pandas as pd
+import numpy as np
+import sys
+
+REGULATION_PERIODS = 4
+REGULATION_PERIOD_SECONDS = 720
+OVERTIME_PERIOD_SECONDS = 300
+
+# Game-player pairs are keyed as GAME_ID * PLAYER_KEY_BASE + PLAYER_ID
+PLAYER_KEY_BASE = 10 ** 7
+
+HOME = 1
+AWAY = -1
+
+def period_length_seconds(period):
+    """Returns the length of a period in seconds (12 minutes, 5 minutes in overtime)."""
+    return np.where(np.asarray(period) <= REGULATION_PERIODS, REGULATION_PERIOD_SECONDS, OVERTIME_PERIOD_SECONDS)
+
+def period_start_seconds(period):
+    """Returns the number of game seconds elapsed before a period starts."""
+    period = np.asarray(period)
+    regulation = np.minimum(period - 1, REGULATION_PERIODS) * REGULATION_PERIOD_SECONDS
+    overtime = np.maximum(period - 1 - REGULATION_PERIODS, 0) * OVERTIME_PERIOD_SECONDS
+    return regulation + overtime
+
+class GameTable:
+    """
+    Array-backed lookups over games.csv and game_players.csv.
+
+    Games and game-player pairs are kept as sorted NumPy arrays, so whole columns
+    of GAME_IDs or (GAME_ID, PLAYER_ID) pairs are resolved with one searchsorted call.
+    """
+
+    def __init__(self, games_df, game_players_df):
+        games_df = games_df.sort_values('GAME_ID')
+        self.game_ids = games_df['GAME_ID'].to_numpy(dtype='int64')
+        self.home_team_ids = games_df['HOME_TEAM_ID'].to_numpy(dtype='int64')
+        self.away_team_ids = games_df['AWAY_TEAM_ID'].to_numpy(dtype='int64')
+        self.num_periods = games_df['NUM_PERIODS'].to_numpy(dtype='int64')
+        self.game_seconds = games_df['GAME_SECONDS'].to_numpy(dtype='int64')
+
+        keys = (game_players_df['GAME_ID'].to_numpy(dtype='int64') * PLAYER_KEY_BASE
+                + game_players_df['PLAYER_ID'].to_numpy(dtype='int64'))
+        order = np.argsort(keys, kind='stable')
+        self._player_keys = keys[order]
+        self._player_sides = game_players_df['SIDE'].to_numpy(dtype='int8')[order]
+
+    @classmethod
+    def load(cls, games_file, game_players_file):
+        """Loads the table from the CSV files written by create_game_table."""
+        return cls(pd.read_csv(games_file), pd.read_csv(game_players_file))
+
+    @staticmethod
+    def _lookup(sorted_keys, keys):
+        """Returns the positions of keys in sorted_keys and a mask of the keys that were found."""
+        keys = np.asarray(keys, dtype='int64')
+        idx = np.minimum(np.searchsorted(sorted_keys, keys), max(len(sorted_keys) - 1, 0))
+        found = sorted_keys[idx] == keys if len(sorted_keys) else np.zeros(keys.shape, dtype=bool)
+        return idx, found
+
+    def teams(self, game_ids):
+        """Returns (home_team_ids, away_team_ids) for an array of games, -1 for unknown games."""
+        idx, found = self._lookup(self.game_ids, game_ids)
+        return np.where(found, self.home_team_ids[idx], -1), np.where(found, self.away_team_ids[idx], -1)
+
+    def sides(self, game_ids, player_ids):
+        """Returns HOME (1), AWAY (-1) or 0 (unknown) for arrays of games and players."""
+        keys = np.asarray(game_ids, dtype='int64') * PLAYER_KEY_BASE + np.asarray(player_ids, dtype='int64')
+        idx, found = self._lookup(self._player_keys, keys)
+        return np.where(found, self._player_sides[idx], 0).astype('int8')
+
+    def game_lengths(self, game_ids):
+        """Returns the length in seconds of each game, -1 for unknown games."""
+        idx, found = self._lookup(self.game_ids, game_ids)
+        return np.where(found, self.game_seconds[idx], -1)
+
+    def period_bounds(self, game_ids, periods):
+        """
+        Returns (start, end) game seconds of each (game, period) pair.
+
+        Periods are laid out from the start of the game; the end of a known game's
+        last period is capped at its GAME_SECONDS.
+        """
+        start = period_start_seconds(periods)
+        end = start + period_length_seconds(periods)
+        game_seconds = self.game_lengths(game_ids)
+        return start, np.where(game_seconds >= 0, np.minimum(end, game_seconds), end)
+
+def create_game_table(stats_file, players_file, games_output_file, game_players_output_file):
+    """
+    Builds the game metadata shared by the later pipeline stages.
+
+    Writes one row per game (home and away team, number of periods and total
+    length) and one row per game and player with the side the player played on.
+
+    Args:
+        stats_file (str): Path to the play-by-play CSV file (e.g., nbastats_2024.csv).
+        players_file (str): Path to the players CSV file.
+        games_output_file (str): Path for the games CSV file.
+        game_players_output_file (str): Path for the game players CSV file.
+    """
+    try:
+        # 1. Load data
+        print("Loading data...")
+        player_ids = set(pd.read_csv(players_file)['PLAYER_ID'])
+        cols = [
+            'GAME_ID', 'PERIOD', 'HOMEDESCRIPTION', 'VISITORDESCRIPTION',
+            'PLAYER1_ID', 'PLAYER1_TEAM_ID',
+            'PLAYER2_ID', 'PLAYER2_TEAM_ID',
+            'PLAYER3_ID', 'PLAYER3_TEAM_ID'
+        ]
+        df = pd.read_csv(stats_file, usecols=cols, low_memory=True)
+        print("Data loaded successfully.")
+
+        # 2. Identify home and away teams from events described for one side only.
+        # Games that cannot be resolved are kept, so no game silently loses its players.
+        print("Identifying home and away teams...")
+        home_only = df['HOMEDESCRIPTION'].notna() & df['VISITORDESCRIPTION'].isna()
+        away_only = df['VISITORDESCRIPTION'].notna() & df['HOMEDESCRIPTION'].isna()
+        games = pd.concat([
+            df.groupby('GAME_ID')['PERIOD'].max().rename('NUM_PERIODS'),
+            df[home_only].groupby('GAME_ID')['PLAYER1_TEAM_ID'].first().rename('HOME_TEAM_ID'),
+            df[away_only].groupby('GAME_ID')['PLAYER1_TEAM_ID'].first().rename('AWAY_TEAM_ID')
+        ], axis=1)
+        resolved = games['HOME_TEAM_ID'].notna() & games['AWAY_TEAM_ID'].notna()
+
+        # Fallback 1: any event described for the side, as create_quarter_rosters used to do
+        games['HOME_TEAM_ID'] = games['HOME_TEAM_ID'].fillna(
+            df[df['HOMEDESCRIPTION'].notna()].groupby('GAME_ID')['PLAYER1_TEAM_ID'].first())
+        games['AWAY_TEAM_ID'] = games['AWAY_TEAM_ID'].fillna(
+            df[df['VISITORDESCRIPTION'].notna()].groupby('GAME_ID')['PLAYER1_TEAM_ID'].first())
+
+        # Fallback 2: in a game with exactly two teams, one side is the other team
+        team_ids = pd.concat([df[['GAME_ID', f'PLAYER{i}_TEAM_ID']].set_axis(['GAME_ID', 'TEAM_ID'], axis=1) for i in (1, 2, 3)])
+        team_ids = team_ids.dropna().drop_duplicates().groupby('GAME_ID')['TEAM_ID'].agg(['min', 'max', 'nunique'])
+        two_team_sum = team_ids['min'] + team_ids['max']
+        two_team_sum = two_team_sum[team_ids['nunique'] == 2].reindex(games.index)
+        games.loc[games['HOME_TEAM_ID'] == games['AWAY_TEAM_ID'], 'AWAY_TEAM_ID'] = np.nan
+        games['HOME_TEAM_ID'] = games['HOME_TEAM_ID'].fillna(two_team_sum - games['AWAY_TEAM_ID'])
+        games['AWAY_TEAM_ID'] = games['AWAY_TEAM_ID'].fillna(two_team_sum - games['HOME_TEAM_ID'])
+
+        unresolved = games['HOME_TEAM_ID'].isna() | games['AWAY_TEAM_ID'].isna()
+        num_fallback = int((~resolved & ~unresolved).sum())
+        if num_fallback:
+            print(f"Warning: resolved the home/away teams of {num_fallback} games with fallback rules.", file=sys.stderr)
+        if unresolved.any():
+            print(f"Warning: could not resolve the home/away teams of {int(unresolved.sum())} games; "
+                  "they are kept with team ID -1 and their players get no side.", file=sys.stderr)
+        games = games.fillna(-1).astype('int64').rename_axis('GAME_ID').reset_index()
+        games = games[['GAME_ID', 'HOME_TEAM_ID', 'AWAY_TEAM_ID', 'NUM_PERIODS']]
+        games['GAME_SECONDS'] = period_start_seconds(games['NUM_PERIODS'] + 1)
+
+        # 3. Determine the side of every player in every game
+        print("Assigning players to sides...")
+        game_players = pd.concat([
+            df[['GAME_ID', f'PLAYER{i}_ID', f'PLAYER{i}_TEAM_ID']].set_axis(['GAME_ID', 'PLAYER_ID', 'TEAM_ID'], axis=1)
+            for i in (1, 2, 3)
+        ]).dropna()
+        game_players = game_players[game_players['PLAYER_ID'].isin(player_ids)].astype('int64')
+        game_players = game_players.drop_duplicates(subset=['GAME_ID', 'PLAYER_ID'])
+        game_players = pd.merge(game_players, games[['GAME_ID', 'HOME_TEAM_ID', 'AWAY_TEAM_ID']], on='GAME_ID')
+        game_players['SIDE'] = np.select(
+            [game_players['TEAM_ID'] == game_players['HOME_TEAM_ID'], game_players['TEAM_ID'] == game_players['AWAY_TEAM_ID']],
+            [HOME, AWAY],
+            0
+        )
+        game_players = game_players[game_players['SIDE'] != 0][['GAME_ID', 'PLAYER_ID', 'TEAM_ID', 'SIDE']]
+        game_players.sort_values(by=['GAME_ID', 'PLAYER_ID'], inplace=True)
+
+        # 4. Save to CSV
+        print(f"Saving games to {games_output_file}...")
+        games.to_csv(games_output_file, index=False)
+        print(f"Saving game players to {game_players_output_file}...")
+        game_players.to_csv(game_players_output_file, index=False)
+
+        print(f"Successfully created game metadata for {len(games)} games.")
+        print("\nFirst 5 games:")
+        print(games.head(5).to_string())
+
+    except FileNotFoundError as e:
+        print(f"Error: The file {e.filename} was not found.", file=sys.stderr)
+    except Exception as e:
+        print(f"An error occurred: {e}", file=sys.stderr)
+
+if __name__ == '__main__':
+    STATS_CSV = 'nbastats_2024.csv'
+    PLAYERS_CSV = 'players.csv'
+    GAMES_CSV = 'games.csv'
+    GAME_PLAYERS_CSV = 'game_players.csv'
+    create_game_table(STATS_CSV, PLAYERS_CSV, GAMES_CSV, GAME_PLAYERS_CSV)
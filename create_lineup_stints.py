@@ -1,5 +1,8 @@
 import pandas as pd
+import os
+import shutil
 import sys
+from create_game_table import GameTable, HOME, AWAY
 
 def convert_time_to_seconds(pctimestring):
     """Converts MM:SS string to remaining seconds in a period."""
@@ -8,57 +11,251 @@ def convert_time_to_seconds(pctimestring):
         return minutes * 60 + seconds
     return 0
 
-def create_lineup_stints(stints_file, starters_file, subs_file, active_players_file, output_file):
+def parse_player_list(s):
+    """Converts a comma-separated player ID string into a set of integer IDs."""
+    return set(map(int, s.split(', '))) if pd.notna(s) and s else set()
+
+def build_starters_lookup(starters_df):
     """
-    Enriches stint data with the full player lineups for each stint.
+    Builds {(game_id, period): {'HOME_SET': set, 'AWAY_SET': set}} from quarter_starters.csv contents.
+    """
+    return {
+        (game_id, period): {'HOME_SET': parse_player_list(home), 'AWAY_SET': parse_player_list(away)}
+        for game_id, period, home, away in zip(
+            starters_df['GAME_ID'].tolist(), starters_df['PERIOD'].tolist(),
+            starters_df['HOME_STARTERS'].tolist(), starters_df['AWAY_STARTERS'].tolist()
+        )
+    }
+
+def season_from_game_id(game_id):
+    """Returns the starting year of the season encoded in an NBA GAME_ID (e.g. 22400001 -> 2024)."""
+    return 2000 + (game_id // 100000) % 100
+
+def write_lineup_stints_parquet(lineup_stints_df, game_table, output_dir, row_group_size=512, batch_index=0,
+                                cleared_partitions=None):
+    """
+    Writes lineup stints as a Parquet dataset partitioned by SEASON and TEAM_ID.
+
+    Every stint is stored under both the home and the away team's partition, so a
+    single team's stints can be read without touching the rest of the season.
+    Rows are sorted by GAME_ID inside each partition and written in small row
+    groups, so the GAME_ID column statistics let readers skip unrelated games.
+    Stints of games whose teams the game table could not resolve (team ID -1) have
+    no team partition; they are not written and their GAME_IDs are returned.
 
     Args:
-        stints_file (str): Path to the stints.csv file.
-        starters_file (str): Path to the quarter_starters.csv file.
-        subs_file (str): Path to the substitutions_log.csv file.
-        active_players_file (str): Path to the quarter_active_players.csv file.
-        output_file (str): Path for the output CSV file.
+        lineup_stints_df (pd.DataFrame): Lineup stints as written to lineup_stints.csv.
+        game_table (GameTable): Game metadata providing the home and away team IDs.
+        output_dir (str): Root directory of the Parquet dataset.
+        row_group_size (int): Maximum number of rows per Parquet row group.
+        batch_index (int): Index of this batch when writing in several calls; used
+            to give every batch its own file names.
+        cleared_partitions (set, optional): (SEASON, TEAM_ID) partitions already
+            rewritten by earlier batches of the same run. Partitions not in the set are
+            cleared before writing and then added to it. Without it, existing data in
+            the touched partitions is replaced. Partitions this data does not touch are
+            never removed.
+
+    Returns:
+        np.ndarray: The GAME_ID of every stint that was not written.
     """
-    try:
-        # 1. Load all necessary data
-        print("Loading input files...")
-        stints_df = pd.read_csv(stints_file)
-        starters_df = pd.read_csv(starters_file)
-        subs_df = pd.read_csv(subs_file)
-        active_players_df = pd.read_csv(active_players_file)
-        print("Files loaded successfully.")
-
-        # 2. Prepare lookups for efficient processing
-        print("Preparing data lookups...")
-        
-        # Starters lookup: {(game_id, period): {'home': {p1, p2}, 'away': {pA, pB}}}
-        def parse_player_list(s):
-            return set(map(int, s.split(', '))) if pd.notna(s) and s else set()
-        
-        starters_df['HOME_SET'] = starters_df['HOME_STARTERS'].apply(parse_player_list)
-        starters_df['AWAY_SET'] = starters_df['AWAY_STARTERS'].apply(parse_player_list)
-        starters_lookup = starters_df.set_index(['GAME_ID', 'PERIOD'])[['HOME_SET', 'AWAY_SET']].to_dict('index')
-
-        # Player-team lookup: {(game_id, player_id): 'home'/'away'}
-        player_team_lookup = {}
-        for _, row in active_players_df.iterrows():
-            game_id = row['GAME_ID']
-            for player_id in parse_player_list(row['HOME_PLAYERS']):
-                player_team_lookup[(game_id, player_id)] = 'home'
-            for player_id in parse_player_list(row['AWAY_PLAYERS']):
-                player_team_lookup[(game_id, player_id)] = 'away'
-
-        # Substitutions lookup: {(game_id, period, time_seconds): [sub_list]}
-        subs_df['SECONDS_REMAINING'] = subs_df['TIME'].apply(convert_time_to_seconds)
-        subs_lookup = subs_df.groupby(['GAME_ID', 'PERIOD', 'SECONDS_REMAINING'])[['PLAYER_OUT_ID', 'PLAYER_IN_ID']].apply(lambda x: x.to_dict('records')).to_dict()
-
-        # 3. Process stints game by game
-        print("Processing stints to determine lineups...")
-        all_lineup_stints = []
-        
-        # Group stints by game and period to process them chronologically
-        for (game_id, period), period_stints in stints_df.groupby(['GAME_ID', 'PERIOD']):
-            
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    df = lineup_stints_df.astype({'GAME_ID': 'int64', 'PERIOD': 'int64'})
+    df['HOME_TEAM_ID'], df['AWAY_TEAM_ID'] = game_table.teams(df['GAME_ID'])
+    resolved = (df['HOME_TEAM_ID'] >= 0) & (df['AWAY_TEAM_ID'] >= 0)
+    skipped_game_ids = df.loc[~resolved, 'GAME_ID'].to_numpy()
+    df = df[resolved]
+    df['SEASON'] = season_from_game_id(df['GAME_ID']).astype('int32')
+
+    # One copy of every stint per participating team
+    df = pd.concat([
+        df.assign(TEAM_ID=df['HOME_TEAM_ID']),
+        df.assign(TEAM_ID=df['AWAY_TEAM_ID'])
+    ], ignore_index=True)
+    df.sort_values(by=['SEASON', 'TEAM_ID', 'GAME_ID', 'PERIOD', 'STINT_START_SECONDS'],
+                   ascending=[True, True, True, True, False], inplace=True)
+
+    if cleared_partitions is not None:
+        # Clear stale files of partitions this run writes to for the first time
+        touched = set(df[['SEASON', 'TEAM_ID']].drop_duplicates().itertuples(index=False, name=None))
+        for season, team_id in touched - cleared_partitions:
+            shutil.rmtree(os.path.join(output_dir, f'SEASON={season}', f'TEAM_ID={team_id}'), ignore_errors=True)
+        cleared_partitions |= touched
+
+    ds.write_dataset(
+        pa.Table.from_pandas(df, preserve_index=False),
+        output_dir,
+        format='parquet',
+        partitioning=_lineup_stints_partitioning(),
+        file_options=ds.ParquetFileFormat().make_write_options(write_statistics=True),
+        min_rows_per_group=row_group_size,
+        max_rows_per_group=row_group_size,
+        basename_template=f'part-{batch_index}-{{i}}.parquet',
+        existing_data_behavior='delete_matching' if cleared_partitions is None else 'overwrite_or_ignore',
+        use_threads=False
+    )
+    return skipped_game_ids
+
+def _lineup_stints_partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    return ds.partitioning(pa.schema([('SEASON', pa.int32()), ('TEAM_ID', pa.int64())]), flavor='hive')
+
+def read_lineup_stints(dataset_dir, team_id=None, game_ids=None, periods=None, seasons=None, columns=None):
+    """
+    Reads lineup stints from a Parquet dataset written by write_lineup_stints_parquet.
+
+    Filters are pushed down to the dataset: the team and season filters prune
+    whole partitions, and the game and period filters skip row groups using
+    their column statistics.
+
+    Args:
+        dataset_dir (str): Root directory of the Parquet dataset.
+        team_id (int, optional): Only return stints this team took part in.
+        game_ids (list, optional): Only return stints from these games.
+        periods (list, optional): Only return stints from these periods.
+        seasons (list, optional): Only return stints from these seasons (e.g. [2024]).
+        columns (list, optional): Columns to load. Defaults to all columns.
+
+    Returns:
+        pd.DataFrame: The matching lineup stints, each stint appearing once.
+    """
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(dataset_dir, format='parquet', partitioning=_lineup_stints_partitioning())
+
+    if team_id is not None:
+        expression = ds.field('TEAM_ID') == team_id
+    else:
+        # Every stint is stored once per team; keep the home team's copy
+        expression = ds.field('TEAM_ID') == ds.field('HOME_TEAM_ID')
+    if seasons is not None:
+        expression &= ds.field('SEASON').isin(list(seasons))
+    if game_ids is not None:
+        expression &= ds.field('GAME_ID').isin(list(game_ids))
+    if periods is not None:
+        expression &= ds.field('PERIOD').isin(list(periods))
+
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+def iter_game_groups(csv_file, chunksize=50000):
+    """
+    Reads a CSV file in chunks and yields its rows one game at a time.
+
+    The file is expected to be grouped by GAME_ID in ascending order, as the
+    stints, starters and substitution files are. A game spanning two chunks is
+    held back until it is complete.
+
+    Yields:
+        tuple: (game_id, pd.DataFrame of that game's rows).
+    """
+    carry = None
+    for chunk in pd.read_csv(csv_file, chunksize=chunksize):
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        last_game = chunk['GAME_ID'].iloc[-1]
+        carry = chunk[chunk['GAME_ID'] == last_game]
+        yield from chunk[chunk['GAME_ID'] != last_game].groupby('GAME_ID', sort=False)
+    if carry is not None and not carry.empty:
+        yield from carry.groupby('GAME_ID', sort=False)
+
+def _take_game_group(groups, current, game_id):
+    """
+    Advances a (game_id, DataFrame) iterator to game_id.
+
+    Returns the game's DataFrame (None if the game has no rows) and the next
+    pending group of the iterator.
+    """
+    while current is not None and current[0] < game_id:
+        current = next(groups, None)
+    if current is not None and current[0] == game_id:
+        return current[1], next(groups, None)
+    return None, current
+
+def active_player_sides(active_players_df):
+    """Returns a (GAME_ID, PLAYER_ID) -> HOME/AWAY Series from quarter_active_players.csv contents."""
+    sides = []
+    for column, side in [('HOME_PLAYERS', HOME), ('AWAY_PLAYERS', AWAY)]:
+        players = active_players_df[['GAME_ID', column]].dropna()
+        players = players.assign(PLAYER_ID=players[column].str.split(', ')).explode('PLAYER_ID')
+        sides.append(pd.DataFrame({'GAME_ID': players['GAME_ID'], 'PLAYER_ID': players['PLAYER_ID'].astype('int64'), 'SIDE': side}))
+    sides = pd.concat(sides).drop_duplicates(subset=['GAME_ID', 'PLAYER_ID'], keep='last')
+    return sides.set_index(['GAME_ID', 'PLAYER_ID'])['SIDE']
+
+def build_subs_lookup(subs_df, game_table, active_players_df=None):
+    """
+    Builds {(game_id, period, seconds_remaining): [{'PLAYER_OUT_ID', 'PLAYER_IN_ID', 'SIDE'}]}
+    from substitutions_log.csv contents, where SIDE is the GameTable side of the player going out.
+    Players the game table cannot place fall back to their side in active_players_df, if given.
+    """
+    sides = game_table.sides(subs_df['GAME_ID'], subs_df['PLAYER_OUT_ID'])
+    unresolved = sides == 0
+    if active_players_df is not None and unresolved.any():
+        fallback = active_player_sides(active_players_df).reindex(
+            pd.MultiIndex.from_frame(subs_df.loc[unresolved, ['GAME_ID', 'PLAYER_OUT_ID']])
+        )
+        sides[unresolved] = fallback.fillna(0).to_numpy(dtype='int8')
+
+    # Walk the column arrays once; substitutions keep their order within a key
+    subs_lookup = {}
+    for game_id, period, time, p_out, p_in, side in zip(
+        subs_df['GAME_ID'].tolist(), subs_df['PERIOD'].tolist(), subs_df['TIME'].tolist(),
+        subs_df['PLAYER_OUT_ID'].tolist(), subs_df['PLAYER_IN_ID'].tolist(), sides.tolist()
+    ):
+        subs_lookup.setdefault((game_id, period, convert_time_to_seconds(time)), []).append(
+            {'PLAYER_OUT_ID': p_out, 'PLAYER_IN_ID': p_in, 'SIDE': side}
+        )
+    return subs_lookup
+
+def iter_game_inputs(stints_file, starters_file, subs_file, game_table, active_players_file=None, chunksize=50000):
+    """
+    Reads the stints, starters, substitution and (optionally) active player files side
+    by side, one game at a time.
+
+    Only the current game's starters and substitution lookups are held in memory.
+    The active players are read only to place players the game table cannot.
+
+    Yields:
+        tuple: (game_id, stints DataFrame, starters lookup, substitutions lookup) for
+        every game in stints_file; see build_starters_lookup and build_subs_lookup.
+    """
+    starters_groups = iter_game_groups(starters_file, chunksize)
+    subs_groups = iter_game_groups(subs_file, chunksize)
+    next_starters = next(starters_groups, None)
+    next_subs = next(subs_groups, None)
+    active_groups = iter_game_groups(active_players_file, chunksize) if active_players_file else iter(())
+    next_active = next(active_groups, None)
+
+    for game_id, game_stints_df in iter_game_groups(stints_file, chunksize):
+        starters_df, next_starters = _take_game_group(starters_groups, next_starters, game_id)
+        subs_df, next_subs = _take_game_group(subs_groups, next_subs, game_id)
+        active_df, next_active = _take_game_group(active_groups, next_active, game_id)
+        starters_lookup = build_starters_lookup(starters_df) if starters_df is not None else {}
+        subs_lookup = build_subs_lookup(subs_df, game_table, active_df) if subs_df is not None else {}
+        yield game_id, game_stints_df, starters_lookup, subs_lookup
+
+def generate_lineup_stints(game_inputs):
+    """
+    Replays each game's substitutions to attach the on-court lineups to its stints.
+
+    Args:
+        game_inputs (iterable): (game_id, stints DataFrame, starters lookup, substitutions
+            lookup) tuples, e.g. from iter_game_inputs. The starters lookup maps
+            (game_id, period) to {'HOME_SET': set, 'AWAY_SET': set}; the substitutions
+            lookup is described in build_subs_lookup.
+
+    Yields:
+        pd.DataFrame: The lineup stints of one game.
+    """
+    for game_id, game_stints_df, starters_lookup, subs_lookup in game_inputs:
+        lineup_stints = []
+
+        # Group stints by period to process them chronologically
+        for period, period_stints in game_stints_df.groupby('PERIOD'):
+
             # Get initial lineup for the quarter
             starter_info = starters_lookup.get((game_id, period), {})
             home_lineup = starter_info.get('HOME_SET', set()).copy()
@@ -66,41 +263,124 @@ def create_lineup_stints(stints_file, starters_file, subs_file, active_players_f
 
             # Sort stints chronologically (descending start time)
             period_stints = period_stints.sort_values(by='STINT_START_SECONDS', ascending=False)
-            
-            for _, stint in period_stints.iterrows():
+
+            for stint_data in period_stints.to_dict('records'):
                 # Add current lineup to the stint record
-                stint_data = stint.to_dict()
                 stint_data['HOME_LINEUP'] = ', '.join(sorted([str(p) for p in home_lineup]))
                 stint_data['AWAY_LINEUP'] = ', '.join(sorted([str(p) for p in away_lineup]))
-                all_lineup_stints.append(stint_data)
-                
+                lineup_stints.append(stint_data)
+
                 # Find substitutions at the end of this stint to prepare for the next
-                sub_time = stint['STINT_END_SECONDS']
+                sub_time = stint_data['STINT_END_SECONDS']
                 subs_for_next_stint = subs_lookup.get((game_id, period, sub_time), [])
-                
+
                 for sub in subs_for_next_stint:
                     p_out, p_in = sub['PLAYER_OUT_ID'], sub['PLAYER_IN_ID']
-                    
+
                     # Update lineups based on player's team
-                    if player_team_lookup.get((game_id, p_out)) == 'home':
+                    if sub['SIDE'] == HOME:
                         home_lineup.discard(p_out)
                         home_lineup.add(p_in)
-                    elif player_team_lookup.get((game_id, p_out)) == 'away':
+                    elif sub['SIDE'] == AWAY:
                         away_lineup.discard(p_out)
                         away_lineup.add(p_in)
-        
-        # 4. Create and save the final DataFrame
-        print("Saving final lineup stints...")
-        final_df = pd.DataFrame(all_lineup_stints)
-        
+
         # Reorder columns for clarity
-        cols = ['GAME_ID', 'PERIOD', 'HOME_LINEUP', 'AWAY_LINEUP'] + [c for c in stints_df.columns if c not in ['GAME_ID', 'PERIOD']]
-        final_df = final_df[cols]
+        cols = ['GAME_ID', 'PERIOD', 'HOME_LINEUP', 'AWAY_LINEUP'] + [c for c in game_stints_df.columns if c not in ['GAME_ID', 'PERIOD']]
+        yield pd.DataFrame(lineup_stints, columns=cols)
+
+def write_lineup_stints(lineup_stint_frames, output_file, batch_size=10000, parquet_dir=None, game_table=None):
+    """
+    Streams lineup stints to CSV (and optionally Parquet) in fixed-size batches.
+
+    Only one batch is held in memory at a time, and each batch is flushed to
+    disk as soon as it is full, so output is available while the run continues.
+    Stints of games without resolved teams are written to the CSV only; a warning
+    reports how many were left out of the Parquet dataset.
+
+    Args:
+        lineup_stint_frames (iterable): DataFrames of lineup stints, e.g. from generate_lineup_stints.
+        output_file (str): Path for the output CSV file.
+        batch_size (int): Number of rows written per batch.
+        parquet_dir (str, optional): Root directory of a partitioned Parquet dataset to write as well.
+        game_table (GameTable, optional): Game metadata; required with parquet_dir.
+
+    Returns:
+        int: The total number of lineup stints written.
+    """
+    # Batches are appended as new files; each partition is cleared once, on first write
+    cleared_partitions = set()
+    pending = []
+    pending_rows = 0
+    batch_index = 0
+    total_rows = 0
+    skipped_stints = 0
+    skipped_games = set()
+
+    def flush(batch):
+        nonlocal batch_index, total_rows, skipped_stints
+        batch.to_csv(output_file, mode='w' if batch_index == 0 else 'a', header=batch_index == 0, index=False)
+        if parquet_dir:
+            skipped = write_lineup_stints_parquet(batch, game_table, parquet_dir, batch_index=batch_index,
+                                                  cleared_partitions=cleared_partitions)
+            skipped_stints += len(skipped)
+            skipped_games.update(skipped.tolist())
+        batch_index += 1
+        total_rows += len(batch)
+
+    for frame in lineup_stint_frames:
+        pending.append(frame)
+        pending_rows += len(frame)
+        while pending_rows >= batch_size:
+            combined = pd.concat(pending, ignore_index=True)
+            flush(combined.iloc[:batch_size])
+            pending = [combined.iloc[batch_size:]]
+            pending_rows -= batch_size
+
+    if pending_rows:
+        flush(pd.concat(pending, ignore_index=True))
+
+    if skipped_stints:
+        print(f"Warning: {skipped_stints} lineup stints of {len(skipped_games)} games with unresolved teams "
+              f"were written to {output_file} but not to {parquet_dir}.", file=sys.stderr)
+    return total_rows
+
+def create_lineup_stints(stints_file, starters_file, subs_file, active_players_file, output_file,
+                         games_file='games.csv', game_players_file='game_players.csv', parquet_dir=None):
+    """
+    Enriches stint data with the full player lineups for each stint.
+
+    Args:
+        stints_file (str): Path to the stints.csv file.
+        starters_file (str): Path to the quarter_starters.csv file.
+        subs_file (str): Path to the substitutions_log.csv file.
+        active_players_file (str): Path to the quarter_active_players.csv file, used to
+            place players the game table has no side for.
+        output_file (str): Path for the output CSV file.
+        games_file (str): Path to the games.csv file from create_game_table.
+        game_players_file (str): Path to the game_players.csv file from create_game_table.
+        parquet_dir (str, optional): If given, also write the lineup stints as a
+            Parquet dataset partitioned by season and team to this directory.
+    """
+    try:
+        # 1. Load the game table; all other inputs are streamed game by game
+        print("Loading game table...")
+        game_table = GameTable.load(games_file, game_players_file)
+        print("Game table loaded successfully.")
+
+        # 2. Process stints game by game and write them out in batches
+        print("Processing stints to determine lineups...")
+        lineup_stints = generate_lineup_stints(
+            iter_game_inputs(stints_file, starters_file, subs_file, game_table, active_players_file)
+        )
+        num_stints = write_lineup_stints(lineup_stints, output_file, parquet_dir=parquet_dir, game_table=game_table)
+
+        print(f"Successfully created {output_file} with {num_stints} lineup stints")
+        if parquet_dir:
+            print(f"Successfully created {parquet_dir}")
 
-        final_df.to_csv(output_file, index=False)
-        print(f"Successfully created {output_file}")
         print("\nFirst 5 lineup stint entries:")
-        print(final_df.head(5).to_string())
+        print(pd.read_csv(output_file, nrows=5).to_string())
 
     except FileNotFoundError as e:
         print(f"Error: The file {e.filename} was not found.", file=sys.stderr)
@@ -113,5 +393,7 @@ if __name__ == '__main__':
         starters_file='quarter_starters.csv',
         subs_file='substitutions_log.csv',
         active_players_file='quarter_active_players.csv',
-        output_file='lineup_stints.csv'
+        output_file='lineup_stints.csv',
+        games_file='games.csv',
+        game_players_file='game_players.csv'
     ) 
\ No newline at end of file
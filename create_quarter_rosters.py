@@ -1,8 +1,9 @@
 import pandas as pd
 import numpy as np
 import sys
+from create_game_table import GameTable, HOME
 
-def create_quarter_rosters(stats_file, players_file, output_file):
+def create_quarter_rosters(stats_file, players_file, output_file, games_file='games.csv', game_players_file='game_players.csv'):
     """
     Analyzes play-by-play data to find all players with an action in each quarter of each game.
     It lists home and away players in separate columns.
@@ -11,6 +12,8 @@ def create_quarter_rosters(stats_file, players_file, output_file):
         stats_file (str): Path to the play-by-play CSV file (e.g., nbastats_2024.csv).
         players_file (str): Path to the players CSV file.
         output_file (str): Path for the output CSV file.
+        games_file (str): Path to the games.csv file from create_game_table.
+        game_players_file (str): Path to the game_players.csv file from create_game_table.
     """
     try:
         # 1. Load data
@@ -19,38 +22,17 @@ def create_quarter_rosters(stats_file, players_file, output_file):
         player_ids = set(pd.read_csv(players_file)['PLAYER_ID'])
 
         # Load only necessary columns from the main stats file
-        cols = [
-            'GAME_ID', 'PERIOD', 'HOMEDESCRIPTION', 'VISITORDESCRIPTION',
-            'PLAYER1_ID', 'PLAYER1_TEAM_ID',
-            'PLAYER2_ID', 'PLAYER2_TEAM_ID',
-            'PLAYER3_ID', 'PLAYER3_TEAM_ID'
-        ]
+        cols = ['GAME_ID', 'PERIOD', 'PLAYER1_ID', 'PLAYER2_ID', 'PLAYER3_ID']
         df = pd.read_csv(stats_file, usecols=cols, low_memory=True)
+        game_table = GameTable.load(games_file, game_players_file)
         print("Data loaded successfully.")
 
-        # 2. Identify home team for each game
-        print("Identifying home teams...")
-        # Find the first event with a home description for each game to identify the home team ID
-        home_teams = df.dropna(subset=['HOMEDESCRIPTION'])
-        home_team_map = home_teams.groupby('GAME_ID')['PLAYER1_TEAM_ID'].first().to_dict()
-        print("Home teams identified.")
-
-        # 3. Process player data
+        # 2. Process player data
         print("Processing player data...")
         # Melt player columns to create a long format DataFrame
         player_cols = ['PLAYER1_ID', 'PLAYER2_ID', 'PLAYER3_ID']
-        team_cols = ['PLAYER1_TEAM_ID', 'PLAYER2_TEAM_ID', 'PLAYER3_TEAM_ID']
-        
-        # Unpivot player and team IDs
-        id_vars = ['GAME_ID', 'PERIOD']
-        melted_players = pd.melt(df, id_vars=id_vars, value_vars=player_cols, value_name='PLAYER_ID')
-        melted_teams = pd.melt(df, id_vars=id_vars, value_vars=team_cols, value_name='TEAM_ID')
-        
-        # Combine player and team data
-        all_players = pd.concat([
-            melted_players[['GAME_ID', 'PERIOD', 'PLAYER_ID']],
-            melted_teams[['TEAM_ID']]
-        ], axis=1)
+        all_players = pd.melt(df, id_vars=['GAME_ID', 'PERIOD'], value_vars=player_cols, value_name='PLAYER_ID')
+        all_players = all_players[['GAME_ID', 'PERIOD', 'PLAYER_ID']]
 
         # Drop rows with invalid or missing player IDs
         all_players.dropna(subset=['PLAYER_ID'], inplace=True)
@@ -62,12 +44,13 @@ def create_quarter_rosters(stats_file, players_file, output_file):
         # Cast to integer for consistency
         all_players['PLAYER_ID'] = all_players['PLAYER_ID'].astype(int)
         
-        # 4. Determine player role (Home/Away)
+        # 3. Determine player role (Home/Away) from the game table
         print("Determining player roles...")
-        all_players['HOME_TEAM_ID'] = all_players['GAME_ID'].map(home_team_map)
-        all_players['ROLE'] = np.where(all_players['TEAM_ID'] == all_players['HOME_TEAM_ID'], 'Home', 'Away')
+        sides = game_table.sides(all_players['GAME_ID'], all_players['PLAYER_ID'])
+        all_players = all_players[sides != 0].copy()
+        all_players['ROLE'] = np.where(sides[sides != 0] == HOME, 'Home', 'Away')
         
-        # 5. Group by quarter and aggregate players into separate columns
+        # 4. Group by quarter and aggregate players into separate columns
         print("Aggregating results...")
         # Drop duplicates to get unique players per quarter
         unique_players = all_players.drop_duplicates(subset=['GAME_ID', 'PERIOD', 'PLAYER_ID'])
@@ -82,7 +65,7 @@ def create_quarter_rosters(stats_file, players_file, output_file):
 
         final_rosters = unique_players.groupby(['GAME_ID', 'PERIOD']).apply(aggregate_players).reset_index()
         
-        # 6. Save to CSV
+        # 5. Save to CSV
         print(f"Saving results to {output_file}...")
         final_rosters.to_csv(output_file, index=False)
 
@@ -1,8 +1,13 @@
 import pandas as pd
 import numpy as np
-from scipy.sparse import lil_matrix
+from scipy.sparse import lil_matrix, csr_matrix
+from scipy.sparse.linalg import LinearOperator, cg
 from sklearn.linear_model import Ridge
 import sys
+from create_lineup_stints import season_from_game_id
+
+# Player-season columns are keyed as PLAYER_ID * SEASON_KEY_BASE + SEASON
+SEASON_KEY_BASE = 10000
 
 def calculate_rapm(lineup_stints_file, players_file, minutes_file, output_file, regularization_alpha=500, min_minutes=1000):
     """
@@ -100,6 +105,215 @@ def calculate_rapm(lineup_stints_file, players_file, minutes_file, output_file,
     except Exception as e:
         print(f"An error occurred: {e}", file=sys.stderr)
 
+def build_lineup_arrays(lineup_stints_df):
+    """
+    Converts the lineup strings into compact arrays of player-season keys.
+
+    Args:
+        lineup_stints_df (pd.DataFrame): Lineup stints with GAME_ID, HOME_LINEUP and AWAY_LINEUP columns.
+
+    Returns:
+        tuple: (home_keys, away_keys), int64 arrays of shape (n_stints, players_per_side)
+        holding PLAYER_ID * SEASON_KEY_BASE + SEASON, with -1 marking empty slots.
+    """
+    seasons = season_from_game_id(lineup_stints_df['GAME_ID'].astype('int64')).to_numpy()
+
+    lineup_keys = []
+    for column in ['HOME_LINEUP', 'AWAY_LINEUP']:
+        players = lineup_stints_df[column].str.split(', ', expand=True).apply(pd.to_numeric)
+        players = players.fillna(-1).astype('int64').to_numpy()
+        lineup_keys.append(np.where(players >= 0, players * SEASON_KEY_BASE + seasons[:, None], -1))
+    return lineup_keys[0], lineup_keys[1]
+
+def _column_sums(col_idx, values, n_cols):
+    """Sums a per-stint vector into the columns referenced by a lineup index array (X^T for one side)."""
+    sums = np.bincount(col_idx.ravel(), weights=np.repeat(values, col_idx.shape[1]), minlength=n_cols + 1)
+    return sums[:n_cols]
+
+def _season_tie_matrix(column_keys, season_prior_alpha):
+    """
+    Builds the penalty matrix tying each player's consecutive seasons together.
+
+    column_keys are sorted, so a player's seasons are adjacent; a pair is only tied
+    when the seasons follow each other directly, not across a missing season.
+    """
+    players = column_keys // SEASON_KEY_BASE
+    seasons = column_keys % SEASON_KEY_BASE
+    pairs = np.flatnonzero((players[1:] == players[:-1]) & (seasons[1:] - seasons[:-1] == 1))
+    rows = np.repeat(np.arange(len(pairs)), 2)
+    cols = np.column_stack([pairs, pairs + 1]).ravel()
+    values = np.tile([1.0, -1.0], len(pairs))
+    differences = csr_matrix((values, (rows, cols)), shape=(len(pairs), len(column_keys)))
+    return (season_prior_alpha * (differences.T @ differences)).tocsr()
+
+def solve_rapm_cg(home_idx, away_idx, y, weights, n_cols, regularization_alpha, tie_matrix=None,
+                  x0=None, tol=1e-6, max_iter=1000):
+    """
+    Solves the weighted ridge RAPM problem without materializing the design matrix.
+
+    X and X^T are applied directly from the lineup index arrays, where each entry is
+    a column index and n_cols marks an empty slot. An unpenalized intercept is
+    appended as the last unknown, matching sklearn's Ridge. The normal equations are
+    solved with conjugate gradient using a Jacobi (diagonal) preconditioner.
+
+    Args:
+        home_idx (np.ndarray): (n_stints, k) column indices of the home players (+1).
+        away_idx (np.ndarray): (n_stints, k) column indices of the away players (-1).
+        y (np.ndarray): Plus-minus of each stint.
+        weights (np.ndarray): Sample weight of each stint.
+        n_cols (int): Number of player(-season) columns.
+        regularization_alpha (float): Ridge penalty applied to every column.
+        tie_matrix (scipy.sparse matrix, optional): Extra (n_cols, n_cols) penalty, e.g. from _season_tie_matrix.
+        x0 (np.ndarray, optional): Starting coefficients of length n_cols (warm start).
+        tol (float): Relative residual tolerance for conjugate gradient.
+        max_iter (int): Maximum number of conjugate gradient iterations.
+
+    Returns:
+        tuple: (coefficients of length n_cols, intercept, number of iterations, info), where
+        info is scipy's cg status: 0 on convergence, > 0 when max_iter was reached.
+    """
+    def apply_x(v):
+        padded = np.append(v[:n_cols], 0.0)
+        return padded[home_idx].sum(axis=1) - padded[away_idx].sum(axis=1) + v[n_cols]
+
+    def apply_xt(r):
+        return np.append(_column_sums(home_idx, r, n_cols) - _column_sums(away_idx, r, n_cols), r.sum())
+
+    def matvec(v):
+        result = apply_xt(weights * apply_x(v))
+        result[:n_cols] += regularization_alpha * v[:n_cols]
+        if tie_matrix is not None:
+            result[:n_cols] += tie_matrix @ v[:n_cols]
+        return result
+
+    # Entries are +-1, so diag(X^T W X) is the summed weight of each column
+    diagonal = np.append(
+        _column_sums(home_idx, weights, n_cols) + _column_sums(away_idx, weights, n_cols) + regularization_alpha,
+        weights.sum()
+    )
+    if tie_matrix is not None:
+        diagonal[:n_cols] += tie_matrix.diagonal()
+
+    size = n_cols + 1
+    normal_matrix = LinearOperator((size, size), matvec=matvec, dtype=np.float64)
+    preconditioner = LinearOperator((size, size), matvec=lambda v: v / diagonal, dtype=np.float64)
+    start = np.zeros(size) if x0 is None else np.append(x0, 0.0)
+
+    iterations = 0
+    def count_iteration(_):
+        nonlocal iterations
+        iterations += 1
+
+    solution, info = cg(normal_matrix, apply_xt(weights * y), x0=start, rtol=tol, maxiter=max_iter,
+                        M=preconditioner, callback=count_iteration)
+    return solution[:n_cols], solution[n_cols], iterations, info
+
+def calculate_multiseason_rapm(lineup_stints_files, players_file, output_file, regularization_alpha=500,
+                               season_prior_alpha=0, min_minutes=1000, warm_start_file=None,
+                               tol=1e-6, max_iter=1000):
+    """
+    Calculates RAPM with a separate column for every player-season using a
+    matrix-free conjugate gradient solver, which scales to many seasons of stints.
+
+    Args:
+        lineup_stints_files (str or list): Path(s) to lineup_stints.csv files, e.g. one per season.
+        players_file (str): Path to the players.csv file for name mapping.
+        output_file (str): Path for the output CSV file.
+        regularization_alpha (float): The ridge penalty on every player-season coefficient.
+        season_prior_alpha (float): Penalty on the difference between a player's consecutive
+            seasons; 0 fits the seasons independently.
+        min_minutes (int): The minimum minutes a player must have played in a season.
+        warm_start_file (str, optional): Path to a previous output of this function whose
+            coefficients are used as the starting point.
+        tol (float): Relative residual tolerance for conjugate gradient.
+        max_iter (int): Maximum number of conjugate gradient iterations.
+    """
+    try:
+        # 1. Load data
+        print("Loading data...")
+        if isinstance(lineup_stints_files, str):
+            lineup_stints_files = [lineup_stints_files]
+        cols = ['GAME_ID', 'HOME_LINEUP', 'AWAY_LINEUP', 'DURATION_SECONDS', 'PLUS_MINUS']
+        lineup_stints_df = pd.concat(
+            [pd.read_csv(f, usecols=cols) for f in lineup_stints_files], ignore_index=True
+        ).dropna(subset=['HOME_LINEUP', 'AWAY_LINEUP'])
+        players_df = pd.read_csv(players_file)
+        print("Data loaded successfully.")
+
+        # 2. Build compact lineup arrays over player-season columns
+        print("Building lineup arrays...")
+        home_keys, away_keys = build_lineup_arrays(lineup_stints_df)
+        column_keys = np.unique(np.concatenate([home_keys[home_keys >= 0], away_keys[away_keys >= 0]]))
+        n_all = len(column_keys)
+        home_idx = np.where(home_keys >= 0, np.searchsorted(column_keys, home_keys), n_all)
+        away_idx = np.where(away_keys >= 0, np.searchsorted(column_keys, away_keys), n_all)
+
+        y = lineup_stints_df['PLUS_MINUS'].to_numpy(dtype=float)
+        weights = lineup_stints_df['DURATION_SECONDS'].to_numpy(dtype=float)
+
+        # 3. Filter player-seasons by minutes played
+        print(f"Filtering for player-seasons with at least {min_minutes} minutes...")
+        seconds = _column_sums(home_idx, weights, n_all) + _column_sums(away_idx, weights, n_all)
+        qualified = seconds / 60 >= min_minutes
+        column_keys = column_keys[qualified]
+        n_cols = len(column_keys)
+        remap = np.full(n_all + 1, n_cols)
+        remap[np.flatnonzero(qualified)] = np.arange(n_cols)
+        home_idx, away_idx = remap[home_idx], remap[away_idx]
+        print(f"Found {n_cols} player-seasons meeting the minutes criteria.")
+
+        tie_matrix = _season_tie_matrix(column_keys, season_prior_alpha) if season_prior_alpha else None
+
+        x0 = None
+        if warm_start_file:
+            print(f"Warm-starting from {warm_start_file}...")
+            previous_df = pd.read_csv(warm_start_file)
+            previous = pd.Series(
+                previous_df['RAPM'].to_numpy(),
+                index=previous_df['PLAYER_ID'] * SEASON_KEY_BASE + previous_df['SEASON']
+            )
+            x0 = previous.reindex(column_keys).fillna(0).to_numpy()
+
+        # 4. Solve with preconditioned conjugate gradient
+        print(f"Solving RAPM with conjugate gradient (alpha={regularization_alpha}, season_prior_alpha={season_prior_alpha})...")
+        rapm_values, _, iterations, info = solve_rapm_cg(
+            home_idx, away_idx, y, weights, n_cols, regularization_alpha,
+            tie_matrix=tie_matrix, x0=x0, tol=tol, max_iter=max_iter
+        )
+        if info == 0:
+            print(f"Converged after {iterations} iterations.")
+        else:
+            print(f"Warning: conjugate gradient did not converge after {iterations} iterations (info={info}); "
+                  "the coefficients are the last iterate.", file=sys.stderr)
+
+        # 5. Create the results DataFrame
+        print("Formatting results...")
+        results_df = pd.DataFrame({
+            'PLAYER_ID': column_keys // SEASON_KEY_BASE,
+            'SEASON': column_keys % SEASON_KEY_BASE,
+            'RAPM': rapm_values
+        })
+
+        # 6. Merge with player names, sort, and save
+        final_results_df = pd.merge(results_df, players_df, on='PLAYER_ID')
+        final_results_df.sort_values(by=['SEASON', 'RAPM'], ascending=[True, False], inplace=True)
+
+        final_results_df = final_results_df[['PLAYER_ID', 'PLAYER_NAME', 'SEASON', 'RAPM']]
+        final_results_df['RAPM'] = final_results_df['RAPM'].round(4)
+        final_results_df.reset_index(drop=True, inplace=True)
+
+        print(f"Saving RAPM results to {output_file}...")
+        final_results_df.to_csv(output_file, index=False)
+
+        print(f"Successfully calculated RAPM and saved to {output_file}.")
+        print(f"\nTop 20 Player-Seasons by RAPM (>= {min_minutes} minutes):")
+        print(final_results_df.sort_values(by='RAPM', ascending=False).head(20).to_string(index=False))
+
+    except FileNotFoundError as e:
+        print(f"Error: The file {e.filename} was not found.", file=sys.stderr)
+    except Exception as e:
+        print(f"An error occurred: {e}", file=sys.stderr)
+
 if __name__ == '__main__':
     calculate_rapm(
         lineup_stints_file='lineup_stints.csv',
@@ -0,0 +1,259 @@
+import pandas as pd
+import numpy as np
+import sys
+from create_lineup_stints import convert_time_to_seconds
+from create_game_table import GameTable, REGULATION_PERIOD_SECONDS, period_length_seconds, period_start_seconds
+
+def _period_bounds(game_table, game_ids, periods):
+    """Returns (start, end) game seconds of each period, from the game table when one is given."""
+    game_ids, periods = np.asarray(game_ids), np.asarray(periods)
+    if game_table is not None:
+        return game_table.period_bounds(game_ids, periods)
+    start = period_start_seconds(periods)
+    return start, start + period_length_seconds(periods)
+
+def _game_lengths(game_table, game_ids, last_periods):
+    """Returns the length of each game, falling back to the last period seen for games not in the table."""
+    lengths = game_table.game_lengths(game_ids) if game_table is not None else np.full(len(game_ids), -1)
+    return np.where(lengths >= 0, lengths, period_start_seconds(np.asarray(last_periods) + 1))
+
+def _binned_cumsum(differences, bin_seconds):
+    """Integrates per-second difference arrays and sums the result over time bins."""
+    counts = np.cumsum(differences, axis=1)[:, :-1]
+    return counts.reshape(len(counts), -1, bin_seconds).sum(axis=2)
+
+def build_rotation_intervals(subs_df, starters_df, game_table=None):
+    """
+    Converts the substitution log into on-court intervals per player and game.
+
+    Period starters are checked in at the start of the period, and a player whose
+    last action in a period is a check-in stays on court until the period ends.
+    Repeated identical actions (e.g. two check-ins in a row) keep the first one.
+
+    Args:
+        subs_df (pd.DataFrame): Contents of substitutions_log.csv.
+        starters_df (pd.DataFrame): Contents of quarter_starters.csv.
+        game_table (GameTable, optional): Game metadata giving each game's period bounds.
+
+    Returns:
+        pd.DataFrame: One row per interval with GAME_ID, PERIOD, PLAYER_ID, START_SECOND
+        and END_SECOND (game seconds elapsed), DURATION_SECONDS, and START_IS_SUB /
+        END_IS_SUB flags telling real substitutions apart from period boundaries.
+    """
+    # 1. Substitution events with numeric game time
+    remaining = subs_df['TIME'].map(convert_time_to_seconds).to_numpy()
+    period = subs_df['PERIOD'].to_numpy()
+    _, period_end = _period_bounds(game_table, subs_df['GAME_ID'], period)
+    elapsed = period_end - remaining
+    sub_events = pd.concat([
+        pd.DataFrame({'GAME_ID': subs_df['GAME_ID'], 'PERIOD': period, 'PLAYER_ID': subs_df['PLAYER_OUT_ID'],
+                      'SECOND': elapsed, 'ACTION': -1, 'IS_SUB': True}),
+        pd.DataFrame({'GAME_ID': subs_df['GAME_ID'], 'PERIOD': period, 'PLAYER_ID': subs_df['PLAYER_IN_ID'],
+                      'SECOND': elapsed, 'ACTION': 1, 'IS_SUB': True})
+    ])
+
+    # 2. Period starters are checked in at the start of the period
+    starters = pd.concat([
+        starters_df[['GAME_ID', 'PERIOD', 'HOME_STARTERS']].rename(columns={'HOME_STARTERS': 'PLAYER_ID'}),
+        starters_df[['GAME_ID', 'PERIOD', 'AWAY_STARTERS']].rename(columns={'AWAY_STARTERS': 'PLAYER_ID'})
+    ]).dropna()
+    starters = starters.assign(PLAYER_ID=starters['PLAYER_ID'].str.split(', ')).explode('PLAYER_ID')
+    starters['PLAYER_ID'] = starters['PLAYER_ID'].astype('int64')
+    starters['SECOND'], _ = _period_bounds(game_table, starters['GAME_ID'], starters['PERIOD'])
+    starters['ACTION'] = 1
+    starters['IS_SUB'] = False
+
+    # 3. Sort each player's actions chronologically; starters go before any substitution
+    events = pd.concat([starters, sub_events], ignore_index=True)
+    events['ORDER'] = np.arange(len(events))
+    events.sort_values(by=['GAME_ID', 'PERIOD', 'PLAYER_ID', 'SECOND', 'ORDER'], inplace=True, kind='stable')
+
+    keys = events[['GAME_ID', 'PERIOD', 'PLAYER_ID']].to_numpy()
+    new_group = np.ones(len(events), dtype=bool)
+    new_group[1:] = (keys[1:] != keys[:-1]).any(axis=1)
+    action = events['ACTION'].to_numpy()
+    repeated = np.zeros(len(events), dtype=bool)
+    repeated[1:] = ~new_group[1:] & (action[1:] == action[:-1])
+    events = events[~repeated]
+
+    # 4. Close open ends at the period boundaries
+    keys = events[['GAME_ID', 'PERIOD', 'PLAYER_ID']].to_numpy()
+    first = np.ones(len(events), dtype=bool)
+    first[1:] = (keys[1:] != keys[:-1]).any(axis=1)
+    last = np.roll(first, -1)
+    last[-1:] = True
+
+    leading_out = events[first & (events['ACTION'].to_numpy() == -1)]
+    trailing_in = events[last & (events['ACTION'].to_numpy() == 1)]
+    period_start, _ = _period_bounds(game_table, leading_out['GAME_ID'], leading_out['PERIOD'])
+    _, period_end = _period_bounds(game_table, trailing_in['GAME_ID'], trailing_in['PERIOD'])
+    events = pd.concat([
+        leading_out.assign(SECOND=period_start, ACTION=1, IS_SUB=False, ORDER=-1),
+        events,
+        trailing_in.assign(SECOND=period_end, ACTION=-1, IS_SUB=False, ORDER=len(events))
+    ], ignore_index=True)
+    events.sort_values(by=['GAME_ID', 'PERIOD', 'PLAYER_ID', 'SECOND', 'ORDER'], inplace=True, kind='stable')
+
+    # 5. Actions now alternate IN, OUT within every group; pair them up
+    checks_in = events[events['ACTION'] == 1].reset_index(drop=True)
+    checks_out = events[events['ACTION'] == -1].reset_index(drop=True)
+    intervals = pd.DataFrame({
+        'GAME_ID': checks_in['GAME_ID'].astype('int64'),
+        'PERIOD': checks_in['PERIOD'].astype('int64'),
+        'PLAYER_ID': checks_in['PLAYER_ID'].astype('int64'),
+        'START_SECOND': checks_in['SECOND'].astype('int64'),
+        'END_SECOND': checks_out['SECOND'].astype('int64'),
+        'START_IS_SUB': checks_in['IS_SUB'].astype(bool),
+        'END_IS_SUB': checks_out['IS_SUB'].astype(bool)
+    })
+    intervals['DURATION_SECONDS'] = intervals['END_SECOND'] - intervals['START_SECOND']
+    return intervals[intervals['DURATION_SECONDS'] > 0].reset_index(drop=True)
+
+def rotation_heatmap(intervals, bin_seconds=60, game_table=None):
+    """
+    Computes, for every player, the probability of being on court at each point of a game.
+
+    On-court counts per game second are built for the whole league at once from a
+    difference array, then averaged over time bins. Each game only counts towards
+    the seconds it lasted, so overtime bins are averaged over the games that went
+    to overtime.
+
+    Args:
+        intervals (pd.DataFrame): Output of build_rotation_intervals.
+        bin_seconds (int): Width of each time bin in game seconds.
+        game_table (GameTable, optional): Game metadata giving each game's length.
+            Games not in the table last until the end of their last period with intervals.
+
+    Returns:
+        pd.DataFrame: One row per player with GAMES and the on-court probability per bin,
+        divided by the number of the player's games still being played in that bin.
+    """
+    player_ids, player_idx = np.unique(intervals['PLAYER_ID'].to_numpy(), return_inverse=True)
+    player_games = intervals.groupby(['PLAYER_ID', 'GAME_ID'])['PERIOD'].max().reset_index()
+    game_seconds = _game_lengths(game_table, player_games['GAME_ID'].to_numpy(), player_games['PERIOD'].to_numpy())
+    total_seconds = int(max(game_seconds.max(), intervals['END_SECOND'].max()))
+    num_bins = -(-total_seconds // bin_seconds)
+
+    # +1 at every check-in, -1 at every check-out, cumulative sum gives games on court
+    on_court = np.zeros((len(player_ids), num_bins * bin_seconds + 1))
+    np.add.at(on_court, (player_idx, intervals['START_SECOND'].to_numpy()), 1)
+    np.add.at(on_court, (player_idx, intervals['END_SECOND'].to_numpy()), -1)
+
+    # Same for the games in progress: +1 at tip-off, -1 at the end of each game
+    in_progress = np.zeros_like(on_court)
+    games_idx = np.searchsorted(player_ids, player_games['PLAYER_ID'].to_numpy())
+    np.add.at(in_progress, (games_idx, 0), 1)
+    np.add.at(in_progress, (games_idx, game_seconds), -1)
+
+    on_court_seconds = _binned_cumsum(on_court, bin_seconds)
+    game_seconds_played = _binned_cumsum(in_progress, bin_seconds)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        probability = np.where(game_seconds_played > 0, on_court_seconds / game_seconds_played, np.nan)
+
+    games = player_games.groupby('PLAYER_ID').size().reindex(player_ids).to_numpy()
+    heatmap = pd.DataFrame(probability.round(4), columns=[f'SECOND_{i * bin_seconds}' for i in range(num_bins)])
+    heatmap.insert(0, 'GAMES', games)
+    heatmap.insert(0, 'PLAYER_ID', player_ids)
+    return heatmap
+
+def check_in_out_times(intervals):
+    """
+    Summarizes when each player typically checks in and out, per period.
+
+    Only real substitutions are counted; being on court at the start or end of
+    a period is not a check-in or check-out.
+
+    Returns:
+        pd.DataFrame: PLAYER_ID, PERIOD, CHECK_INS, MEDIAN_CHECK_IN_SECOND,
+        CHECK_OUTS and MEDIAN_CHECK_OUT_SECOND (game seconds elapsed).
+    """
+    checks_in = intervals[intervals['START_IS_SUB']].groupby(['PLAYER_ID', 'PERIOD'])['START_SECOND'].agg(
+        CHECK_INS='size', MEDIAN_CHECK_IN_SECOND='median')
+    checks_out = intervals[intervals['END_IS_SUB']].groupby(['PLAYER_ID', 'PERIOD'])['END_SECOND'].agg(
+        CHECK_OUTS='size', MEDIAN_CHECK_OUT_SECOND='median')
+    times = checks_in.join(checks_out, how='outer').reset_index()
+    times[['CHECK_INS', 'CHECK_OUTS']] = times[['CHECK_INS', 'CHECK_OUTS']].fillna(0).astype('int64')
+    return times
+
+def stint_length_distribution(intervals, bin_seconds=120):
+    """
+    Counts each player's on-court intervals by length with a single 2D histogram.
+
+    Intervals are split at period boundaries, so the last bin is the longest period.
+
+    Returns:
+        pd.DataFrame: PLAYER_ID followed by one count column per length bin.
+    """
+    player_ids, player_idx = np.unique(intervals['PLAYER_ID'].to_numpy(), return_inverse=True)
+    length_edges = np.arange(0, REGULATION_PERIOD_SECONDS + bin_seconds, bin_seconds)
+    counts, _, _ = np.histogram2d(
+        player_idx, intervals['DURATION_SECONDS'].to_numpy(),
+        bins=[np.arange(len(player_ids) + 1), length_edges]
+    )
+
+    distribution = pd.DataFrame(
+        counts.astype('int64'),
+        columns=[f'SECONDS_{lo}_{hi}' for lo, hi in zip(length_edges[:-1], length_edges[1:])]
+    )
+    distribution.insert(0, 'PLAYER_ID', player_ids)
+    return distribution
+
+def create_rotation_patterns(log_file, starters_file, intervals_file, heatmap_file, check_times_file, stint_lengths_file,
+                             games_file='games.csv', game_players_file='game_players.csv'):
+    """
+    Builds numeric rotation analytics from the substitution log.
+
+    Args:
+        log_file (str): Path to the substitutions_log.csv file.
+        starters_file (str): Path to the quarter_starters.csv file.
+        intervals_file (str): Path for the on-court intervals CSV file.
+        heatmap_file (str): Path for the per-minute on-court probability CSV file.
+        check_times_file (str): Path for the typical check-in/check-out times CSV file.
+        stint_lengths_file (str): Path for the stint length distribution CSV file.
+        games_file (str): Path to the games.csv file from create_game_table.
+        game_players_file (str): Path to the game_players.csv file from create_game_table.
+    """
+    try:
+        # 1. Load the substitution log and period starters
+        print("Loading input files...")
+        subs_df = pd.read_csv(log_file)
+        starters_df = pd.read_csv(starters_file)
+        game_table = GameTable.load(games_file, game_players_file)
+        print("Files loaded successfully.")
+
+        # 2. Build on-court intervals
+        print("Building on-court intervals...")
+        intervals = build_rotation_intervals(subs_df, starters_df, game_table)
+        intervals.to_csv(intervals_file, index=False)
+        print(f"Saved {len(intervals)} intervals to {intervals_file}")
+
+        # 3. League-wide analytics
+        print("Computing rotation heatmaps...")
+        rotation_heatmap(intervals, game_table=game_table).to_csv(heatmap_file, index=False)
+        print(f"Saved rotation heatmaps to {heatmap_file}")
+
+        print("Computing check-in and check-out times...")
+        check_in_out_times(intervals).to_csv(check_times_file, index=False)
+        print(f"Saved check-in and check-out times to {check_times_file}")
+
+        print("Computing stint length distributions...")
+        stint_length_distribution(intervals).to_csv(stint_lengths_file, index=False)
+        print(f"Saved stint length distributions to {stint_lengths_file}")
+
+        print("\nFirst 10 on-court intervals:")
+        print(intervals.head(10).to_string())
+
+    except FileNotFoundError as e:
+        print(f"Error: The file {e.filename} was not found.", file=sys.stderr)
+    except Exception as e:
+        print(f"An error occurred: {e}", file=sys.stderr)
+
+if __name__ == '__main__':
+    create_rotation_patterns(
+        log_file='substitutions_log.csv',
+        starters_file='quarter_starters.csv',
+        intervals_file='player_rotation_intervals.csv',
+        heatmap_file='player_rotation_heatmap.csv',
+        check_times_file='player_check_times.csv',
+        stint_lengths_file='player_stint_lengths.csv'
+    )
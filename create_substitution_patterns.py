@@ -1,5 +1,6 @@
 import pandas as pd
 import sys
+from create_lineup_stints import convert_time_to_seconds
 
 def create_substitution_patterns(log_file, output_file):
     """
@@ -31,10 +32,10 @@ def create_substitution_patterns(log_file, output_file):
         all_events = pd.concat([out_events, in_events])
 
         # 3. Sort events to ensure correct chronological order
-        # The log is already sorted by GAME_ID, PERIOD, and TIME (descending),
-        # which represents the correct chronological order.
-        # We just need to maintain this order after concatenation.
-        all_events.sort_values(by=['GAME_ID', 'PERIOD', 'TIME'], ascending=[True, True, False], inplace=True)
+        # TIME is the clock remaining, so sort it numerically in descending order
+        # ("9:59" sorts after "10:00" as a string).
+        all_events['SECONDS_REMAINING'] = all_events['TIME'].apply(convert_time_to_seconds)
+        all_events.sort_values(by=['GAME_ID', 'PERIOD', 'SECONDS_REMAINING'], ascending=[True, True, False], inplace=True, kind='stable')
 
         # 4. Group by player and quarter, then create the pattern string
         print("Aggregating substitution patterns...")
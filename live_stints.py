@@ -0,0 +1,306 @@
+import asyncio
+import csv
+import sys
+from collections import defaultdict
+import pandas as pd
+from create_lineup_stints import build_starters_lookup, convert_time_to_seconds
+from create_game_table import GameTable, HOME, AWAY
+
+SUBSTITUTION_EVENT = 8
+
+def _to_int(value):
+    """Converts a raw CSV field to int, returning None for empty values."""
+    if value is None or value == '':
+        return None
+    return int(float(value))
+
+def _parse_margin(value):
+    """Parses SCOREMARGIN, returning None when the event carries no score."""
+    if value is None or value == '' or (isinstance(value, float) and pd.isna(value)):
+        return None
+    if value == 'TIE':
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+class _GameState:
+    """Mutable on-court state of a single game."""
+
+    def __init__(self, game_id):
+        self.game_id = game_id
+        self.period = None
+        self.stint_id = 0
+        self.margin = 0.0
+        self.home_lineup = set()
+        self.away_lineup = set()
+        self.stint = None
+        self.stint_ends = False
+        self.player_seconds = defaultdict(float)
+
+class LiveStintEngine:
+    """
+    Builds lineup stints one play-by-play event at a time.
+
+    Stint boundaries follow create_stints: a stint ends with a substitution event
+    (EVENTMSGTYPE 8) or a period change, and the next stint starts at the following
+    event. Lineups are seeded from the period starters and updated on every
+    substitution, as in create_lineup_stints.
+
+    Each processed event returns a list of update records:
+        - {'TYPE': 'STINT', 'STATUS': 'OPEN'/'CLOSED', ...} with the stint's lineups,
+          duration and plus-minus so far.
+        - {'TYPE': 'MINUTES', 'GAME_ID': ..., 'PLAYER_MINUTES': {player_id: minutes}}
+          whenever a stint closes.
+    """
+
+    def __init__(self, starters_lookup=None, game_table=None):
+        """
+        Args:
+            starters_lookup (dict, optional): {(game_id, period): {'HOME_SET': set, 'AWAY_SET': set}},
+                e.g. from build_starters_lookup. Periods missing from the lookup keep the
+                lineups on court at the end of the previous period. The dict may be
+                filled in while a game is running.
+            game_table (GameTable, optional): Game metadata used to resolve the side of a
+                substituted player; events of games not in the table fall back to their descriptions.
+        """
+        self.starters_lookup = starters_lookup if starters_lookup is not None else {}
+        self.game_table = game_table
+        self.games = {}
+
+    def process_event(self, event):
+        """
+        Applies one play-by-play event and returns the resulting update records.
+
+        Args:
+            event (dict): A play-by-play row with at least GAME_ID, PERIOD, PCTIMESTRING,
+                EVENTMSGTYPE and SCOREMARGIN; substitutions also need PLAYER1_ID (out),
+                PLAYER2_ID (in) and HOMEDESCRIPTION. Values may be raw CSV strings.
+
+        Returns:
+            list: Update records for subscribers.
+        """
+        game_id = _to_int(event['GAME_ID'])
+        period = _to_int(event['PERIOD'])
+        seconds = convert_time_to_seconds(event.get('PCTIMESTRING'))
+        state = self.games.setdefault(game_id, _GameState(game_id))
+        updates = []
+
+        margin = _parse_margin(event.get('SCOREMARGIN'))
+        if margin is not None:
+            state.margin = margin
+
+        if period != state.period:
+            updates.extend(self._close_stint(state))
+            starter_info = self.starters_lookup.get((game_id, period))
+            if starter_info is not None:
+                state.home_lineup = set(starter_info['HOME_SET'])
+                state.away_lineup = set(starter_info['AWAY_SET'])
+            state.period = period
+            self._open_stint(state, seconds)
+        elif state.stint_ends:
+            updates.extend(self._close_stint(state))
+            self._open_stint(state, seconds)
+        state.stint_ends = False
+
+        stint = state.stint
+        stint['STINT_END_SECONDS'] = seconds
+        stint['END_SCORE_MARGIN'] = state.margin
+        if stint['STINT_START_SECONDS'] - seconds > 0:
+            updates.append(self._stint_record(stint, 'OPEN'))
+
+        if _to_int(event.get('EVENTMSGTYPE')) == SUBSTITUTION_EVENT:
+            self._apply_substitution(state, event, self.game_table)
+            state.stint_ends = True
+
+        return updates
+
+    def finish_game(self, game_id):
+        """Closes the open stint of a finished game and returns the resulting update records."""
+        state = self.games.get(game_id)
+        return self._close_stint(state) if state is not None else []
+
+    def player_minutes(self, game_id):
+        """Returns {player_id: minutes} for a game, including the open stint."""
+        state = self.games.get(game_id)
+        if state is None:
+            return {}
+        seconds = dict(state.player_seconds)
+        if state.stint is not None:
+            duration = state.stint['STINT_START_SECONDS'] - state.stint['STINT_END_SECONDS']
+            for player_id in state.stint['HOME_PLAYERS'] | state.stint['AWAY_PLAYERS']:
+                seconds[player_id] = seconds.get(player_id, 0.0) + max(duration, 0)
+        return {player_id: round(s / 60, 2) for player_id, s in seconds.items()}
+
+    def _open_stint(self, state, seconds):
+        state.stint_id += 1
+        state.stint = {
+            'GAME_ID': state.game_id,
+            'PERIOD': state.period,
+            'STINT_ID': state.stint_id,
+            'HOME_PLAYERS': frozenset(state.home_lineup),
+            'AWAY_PLAYERS': frozenset(state.away_lineup),
+            'STINT_START_SECONDS': seconds,
+            'STINT_END_SECONDS': seconds,
+            'START_SCORE_MARGIN': state.margin,
+            'END_SCORE_MARGIN': state.margin
+        }
+
+    def _close_stint(self, state):
+        stint = state.stint
+        state.stint = None
+        if stint is None:
+            return []
+        duration = stint['STINT_START_SECONDS'] - stint['STINT_END_SECONDS']
+        # Zero-duration stints occur between back-to-back substitutions and are dropped
+        if duration <= 0:
+            return []
+        for player_id in stint['HOME_PLAYERS'] | stint['AWAY_PLAYERS']:
+            state.player_seconds[player_id] += duration
+        return [
+            self._stint_record(stint, 'CLOSED'),
+            {'TYPE': 'MINUTES', 'GAME_ID': state.game_id, 'PLAYER_MINUTES': self.player_minutes(state.game_id)}
+        ]
+
+    @staticmethod
+    def _apply_substitution(state, event, game_table):
+        p_out, p_in = _to_int(event.get('PLAYER1_ID')), _to_int(event.get('PLAYER2_ID'))
+        if not p_out or not p_in:
+            return
+        side = game_table.sides([state.game_id], [p_out])[0] if game_table is not None else 0
+        if side == 0:
+            # The home team's events carry a HOMEDESCRIPTION
+            home_description = event.get('HOMEDESCRIPTION')
+            if p_out in state.home_lineup:
+                side = HOME
+            elif p_out not in state.away_lineup and pd.notna(home_description) and home_description:
+                side = HOME
+            else:
+                side = AWAY
+        if side == HOME:
+            state.home_lineup.discard(p_out)
+            state.home_lineup.add(p_in)
+        else:
+            state.away_lineup.discard(p_out)
+            state.away_lineup.add(p_in)
+
+    @staticmethod
+    def _stint_record(stint, status):
+        duration = stint['STINT_START_SECONDS'] - stint['STINT_END_SECONDS']
+        plus_minus = stint['END_SCORE_MARGIN'] - stint['START_SCORE_MARGIN']
+        return {
+            'TYPE': 'STINT',
+            'STATUS': status,
+            'GAME_ID': stint['GAME_ID'],
+            'PERIOD': stint['PERIOD'],
+            'STINT_ID': stint['STINT_ID'],
+            'HOME_LINEUP': ', '.join(sorted([str(p) for p in stint['HOME_PLAYERS']])),
+            'AWAY_LINEUP': ', '.join(sorted([str(p) for p in stint['AWAY_PLAYERS']])),
+            'DURATION_SECONDS': duration,
+            'PLUS_MINUS': plus_minus,
+            'PLUS_MINUS_PER_MINUTE': plus_minus / duration * 60 if duration > 0 else 0.0,
+            'STINT_START_SECONDS': stint['STINT_START_SECONDS'],
+            'STINT_END_SECONDS': stint['STINT_END_SECONDS']
+        }
+
+async def tail_play_by_play(pbp_file, poll_interval=1.0):
+    """
+    Yields rows of a growing play-by-play CSV file as dicts, waiting for new lines.
+
+    Incomplete trailing lines are held back until the writer finishes them.
+    """
+    with open(pbp_file, newline='') as f:
+        header = None
+        buffer = ''
+        while True:
+            line = f.readline()
+            if not line:
+                await asyncio.sleep(poll_interval)
+                continue
+            buffer += line
+            if not buffer.endswith('\n'):
+                continue
+            fields = next(csv.reader([buffer]))
+            buffer = ''
+            if header is None:
+                header = fields
+            else:
+                yield dict(zip(header, fields))
+
+async def queue_events(queue):
+    """Yields events from an asyncio.Queue until a None sentinel is received."""
+    while True:
+        event = await queue.get()
+        if event is None:
+            return
+        yield event
+
+class LiveStintFeed:
+    """Runs a LiveStintEngine over an async event source and fans updates out to subscribers."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._subscribers = []
+
+    def subscribe(self, maxsize=0):
+        """Returns an asyncio.Queue receiving every update record, then None when the feed ends."""
+        queue = asyncio.Queue(maxsize)
+        self._subscribers.append(queue)
+        return queue
+
+    async def run(self, events):
+        """Consumes an async iterable of events, publishing updates as each event is processed."""
+        try:
+            async for event in events:
+                for update in self.engine.process_event(event):
+                    await self._publish(update)
+            for game_id in list(self.engine.games):
+                for update in self.engine.finish_game(game_id):
+                    await self._publish(update)
+        finally:
+            for queue in self._subscribers:
+                await queue.put(None)
+
+    async def _publish(self, update):
+        for queue in self._subscribers:
+            await queue.put(update)
+
+async def print_updates(queue):
+    """Prints closed stints and minute totals as they arrive."""
+    while True:
+        update = await queue.get()
+        if update is None:
+            return
+        if update['TYPE'] == 'STINT' and update['STATUS'] == 'CLOSED':
+            print(f"Game {update['GAME_ID']} Q{update['PERIOD']} stint {update['STINT_ID']}: "
+                  f"{update['DURATION_SECONDS']}s, {update['PLUS_MINUS']:+.0f} | "
+                  f"{update['HOME_LINEUP']} vs {update['AWAY_LINEUP']}")
+
+async def run_live_stints(pbp_file, starters_file=None, games_file=None, game_players_file=None, poll_interval=1.0):
+    """
+    Tails a play-by-play file and prints lineup stints as they close.
+
+    Args:
+        pbp_file (str): Path to the play-by-play CSV file being appended to.
+        starters_file (str, optional): Path to a quarter_starters.csv file used to seed lineups.
+        games_file (str, optional): Path to a games.csv file from create_game_table.
+        game_players_file (str, optional): Path to the matching game_players.csv file.
+        poll_interval (float): Seconds to wait before checking the file for new events.
+    """
+    starters_lookup = build_starters_lookup(pd.read_csv(starters_file)) if starters_file else {}
+    game_table = GameTable.load(games_file, game_players_file) if games_file and game_players_file else None
+    feed = LiveStintFeed(LiveStintEngine(starters_lookup, game_table))
+    printer = asyncio.create_task(print_updates(feed.subscribe()))
+    await feed.run(tail_play_by_play(pbp_file, poll_interval))
+    await printer
+
+if __name__ == '__main__':
+    PBP_CSV = 'nbastats_live.csv'
+    STARTERS_CSV = 'quarter_starters.csv'
+    try:
+        asyncio.run(run_live_stints(PBP_CSV, STARTERS_CSV))
+    except FileNotFoundError as e:
+        print(f"Error: The file {e.filename} was not found.", file=sys.stderr)
+    except KeyboardInterrupt:
+        print("Stopped.")
@@ -0,0 +1,209 @@
+import pandas as pd
+import numpy as np
+from itertools import combinations
+import sys
+
+LINEUP_SIZE = 5
+
+# score_matchups(top_k=None) formats every matchup as strings, about 1.2 KB per pair;
+# two 12-man rosters (627,264 pairs) fit, two 15-man rosters (9M pairs) would need ~11 GB
+MAX_ALL_MATCHUPS = 1_000_000
+
+def load_rapm_coefficients(rapm_file, season=None):
+    """
+    Loads RAPM coefficients as a PLAYER_ID -> RAPM Series.
+
+    Args:
+        rapm_file (str): Path to a calculate_rapm or calculate_multiseason_rapm output file.
+        season (int, optional): Season to select when the file has a SEASON column.
+            Defaults to the latest season in the file, so every PLAYER_ID appears once.
+    """
+    rapm_df = pd.read_csv(rapm_file)
+    if 'SEASON' in rapm_df.columns:
+        rapm_df = rapm_df[rapm_df['SEASON'] == (rapm_df['SEASON'].max() if season is None else season)]
+    elif season is not None:
+        raise ValueError(f"{rapm_file} has no SEASON column to select season {season} from.")
+    return rapm_df.set_index('PLAYER_ID')['RAPM']
+
+def lineup_combinations(num_players, size=LINEUP_SIZE):
+    """Returns a (n choose size, size) array with every combination of player positions."""
+    flat = np.fromiter(
+        (i for combination in combinations(range(num_players), size) for i in combination),
+        dtype=np.int64
+    )
+    return flat.reshape(-1, size)
+
+def _top_k(scores, k):
+    """Returns the flat indices of the k highest scores, best first."""
+    flat = scores.ravel()
+    if k is None or k >= flat.size:
+        return np.argsort(-flat, kind='stable')
+    candidates = np.argpartition(-flat, k - 1)[:k]
+    return candidates[np.argsort(-flat[candidates], kind='stable')]
+
+def _coefficient_vector(player_ids, coefficients, missing_value):
+    """Looks up the coefficient of every player, using missing_value for unrated players."""
+    return coefficients.reindex(player_ids).fillna(missing_value).to_numpy(dtype=float)
+
+def _lineup_strings(player_ids, lineups):
+    """Formats lineup index rows like the stint lineups: player ID strings sorted as strings."""
+    ids = np.sort(np.asarray(player_ids)[lineups].astype(str), axis=1)
+    return pd.Series(ids.tolist()).str.join(', ')
+
+def score_lineups(roster_ids, coefficients, top_k=None, missing_value=0.0, size=LINEUP_SIZE):
+    """
+    Scores every lineup that can be formed from a roster.
+
+    A lineup's projected rating is the sum of its players' RAPM coefficients,
+    computed for all combinations at once by indexing the coefficient vector.
+
+    Args:
+        roster_ids (list): PLAYER_IDs available to the team.
+        coefficients (pd.Series): PLAYER_ID -> RAPM, e.g. from load_rapm_coefficients.
+        top_k (int, optional): Only return the best top_k lineups.
+        missing_value (float): Rating used for players without a coefficient.
+        size (int): Number of players per lineup.
+
+    Returns:
+        pd.DataFrame: LINEUP and PROJECTED_RAPM, best lineup first.
+    """
+    roster_ids = np.asarray(roster_ids, dtype=np.int64)
+    lineups = lineup_combinations(len(roster_ids), size)
+    scores = _coefficient_vector(roster_ids, coefficients, missing_value)[lineups].sum(axis=1)
+
+    best = _top_k(scores, top_k)
+    return pd.DataFrame({
+        'LINEUP': _lineup_strings(roster_ids, lineups[best]),
+        'PROJECTED_RAPM': scores[best]
+    })
+
+def _top_k_pairs(scores, opponent_scores, k, block_size):
+    """
+    Returns (rows, cols, net) of the k highest scores[row] - opponent_scores[col], best first.
+
+    Rows are processed in blocks of block_size and only a running top k is kept,
+    so at most (block_size x opponents) net ratings are held in memory.
+    """
+    if k is None:
+        k, block_size = len(scores) * len(opponent_scores), max(len(scores), 1)
+    rows, cols, net = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    for start in range(0, len(scores), block_size):
+        block = scores[start:start + block_size, None] - opponent_scores[None, :]
+        block_best = _top_k(block, k)
+        block_rows, block_cols = np.unravel_index(block_best, block.shape)
+        rows = np.concatenate([rows, block_rows + start])
+        cols = np.concatenate([cols, block_cols])
+        net = np.concatenate([net, block.ravel()[block_best]])
+        keep = _top_k(net, k)
+        rows, cols, net = rows[keep], cols[keep], net[keep]
+    return rows, cols, net
+
+def score_matchups(roster_ids, opponent_ids, coefficients, top_k=10, opponent_lineups=None,
+                   missing_value=0.0, size=LINEUP_SIZE, block_size=4096):
+    """
+    Scores lineups from a roster against opponent lineups.
+
+    The projected net rating of a matchup is the lineup's projected RAPM minus the
+    opponent lineup's. When every opponent combination is scored, the top_k matchups
+    can only pair one of the top_k lineups with one of the opponent's bottom top_k
+    lineups, so only that (top_k x top_k) block is scored. Given opponent lineups are
+    scored in blocks of lineups with a running top_k.
+
+    Args:
+        roster_ids (list): PLAYER_IDs available to the team.
+        opponent_ids (list): PLAYER_IDs available to the opponent.
+        coefficients (pd.Series): PLAYER_ID -> RAPM, e.g. from load_rapm_coefficients.
+        top_k (int, optional): Number of matchups to return. None returns all of them,
+            which is only allowed up to MAX_ALL_MATCHUPS pairs.
+        opponent_lineups (list, optional): Likely opponent units as lists of PLAYER_IDs.
+            Defaults to every combination of opponent_ids.
+        missing_value (float): Rating used for players without a coefficient.
+        size (int): Number of players per lineup.
+        block_size (int): Number of lineups scored at once against the opponent lineups.
+
+    Returns:
+        pd.DataFrame: LINEUP, OPPONENT_LINEUP and PROJECTED_NET_RAPM, best matchup first.
+    """
+    roster_ids = np.asarray(roster_ids, dtype=np.int64)
+    lineups = lineup_combinations(len(roster_ids), size)
+    scores = _coefficient_vector(roster_ids, coefficients, missing_value)[lineups].sum(axis=1)
+
+    if opponent_lineups is None:
+        opponent_ids = np.asarray(opponent_ids, dtype=np.int64)
+        opponent_units = lineup_combinations(len(opponent_ids), size)
+    else:
+        # Index the given units into a de-duplicated player array
+        opponent_ids, opponent_units = np.unique(np.asarray(opponent_lineups, dtype=np.int64), return_inverse=True)
+        opponent_units = opponent_units.reshape(len(opponent_lineups), -1)
+    opponent_scores = _coefficient_vector(opponent_ids, coefficients, missing_value)[opponent_units].sum(axis=1)
+
+    num_pairs = len(scores) * len(opponent_scores)
+    if top_k is None and num_pairs > MAX_ALL_MATCHUPS:
+        raise ValueError(f"Scoring all {num_pairs} matchups exceeds MAX_ALL_MATCHUPS ({MAX_ALL_MATCHUPS}); pass a top_k.")
+
+    if opponent_lineups is None and top_k is not None:
+        # Best lineups against the weakest opponent lineups
+        lineup_candidates = _top_k(scores, top_k)
+        opponent_candidates = _top_k(-opponent_scores, top_k)
+        rows, cols, net = _top_k_pairs(scores[lineup_candidates], opponent_scores[opponent_candidates], top_k, block_size)
+        lineup_idx, opponent_idx = lineup_candidates[rows], opponent_candidates[cols]
+    else:
+        lineup_idx, opponent_idx, net = _top_k_pairs(scores, opponent_scores, top_k, block_size)
+
+    return pd.DataFrame({
+        'LINEUP': _lineup_strings(roster_ids, lineups[lineup_idx]),
+        'OPPONENT_LINEUP': _lineup_strings(opponent_ids, opponent_units[opponent_idx]),
+        'PROJECTED_NET_RAPM': net
+    })
+
+def score_team_lineups(rapm_file, assignments_file, team_id, opponent_team_id, output_file, top_k=20):
+    """
+    Ranks every lineup of a team, and its best matchups against an opponent, by projected RAPM.
+
+    Args:
+        rapm_file (str): Path to the RAPM results CSV file.
+        assignments_file (str): Path to the player_team_assignments.csv file.
+        team_id (int): TEAM_ID whose lineups are ranked.
+        opponent_team_id (int): TEAM_ID of the opponent.
+        output_file (str): Path for the ranked lineups CSV file.
+        top_k (int): Number of lineups and matchups to print.
+    """
+    try:
+        # 1. Load coefficients and rosters
+        print("Loading data...")
+        coefficients = load_rapm_coefficients(rapm_file)
+        assignments_df = pd.read_csv(assignments_file)
+        roster_ids = assignments_df.loc[assignments_df['TEAM_ID'] == team_id, 'PLAYER_ID'].unique()
+        opponent_ids = assignments_df.loc[assignments_df['TEAM_ID'] == opponent_team_id, 'PLAYER_ID'].unique()
+        print(f"Loaded {len(roster_ids)} players for team {team_id} and {len(opponent_ids)} for team {opponent_team_id}.")
+
+        # 2. Rank every lineup of the team
+        print("Scoring lineups...")
+        lineups_df = score_lineups(roster_ids, coefficients)
+        lineups_df['PROJECTED_RAPM'] = lineups_df['PROJECTED_RAPM'].round(4)
+
+        print(f"Saving ranked lineups to {output_file}...")
+        lineups_df.to_csv(output_file, index=False)
+        print(f"\nTop {top_k} lineups:")
+        print(lineups_df.head(top_k).to_string(index=False))
+
+        # 3. Rank matchups against every opponent lineup
+        print("\nScoring matchups...")
+        matchups_df = score_matchups(roster_ids, opponent_ids, coefficients, top_k=top_k)
+        matchups_df['PROJECTED_NET_RAPM'] = matchups_df['PROJECTED_NET_RAPM'].round(4)
+        print(f"\nTop {top_k} matchups:")
+        print(matchups_df.to_string(index=False))
+
+    except FileNotFoundError as e:
+        print(f"Error: The file {e.filename} was not found.", file=sys.stderr)
+    except Exception as e:
+        print(f"An error occurred: {e}", file=sys.stderr)
+
+if __name__ == '__main__':
+    score_team_lineups(
+        rapm_file='rapm_results_min1000.csv',
+        assignments_file='player_team_assignments.csv',
+        team_id=1610612738,
+        opponent_team_id=1610612752,
+        output_file='team_lineup_rankings.csv'
+    )